@@ -7,25 +7,32 @@ import random
 import math
 from panda3d.core import NodePath, Geom, GeomNode
 from panda3d.core import GeomVertexFormat, GeomVertexData, GeomVertexWriter, GeomTriangles
+from force_field import ForceField
+from particle_interaction import ParticleInteraction
+from rewind import RewindBuffer
 
 
 class Particle:
-    def __init__(self, position, velocity, color, lifespan, emitter_id):
+    def __init__(self, position, velocity, color, lifespan, emitter_id, interacting=False):
         self.position = Vec3(position)
         self.velocity = Vec3(velocity)
         self.color = color
         self.lifespan = lifespan
         self.age = 0
         self.emitter_id = emitter_id
+        self.id = None #given by the particle system, the rewind history tracks particles by it
+        self.interacting = interacting
+        self.field_force = None
 
 
 class Emitter:
-    def __init__(self, position, rate, emitter_id, color, area_size=None):
+    def __init__(self, position, rate, emitter_id, color, area_size=None, interacting=False):
         self.position = Vec3(position)
         self.rate = rate
         self.emitter_id = emitter_id
         self.color = color
         self.area_size = area_size
+        self.interacting = interacting
 
     def emit(self):
         if self.area_size:
@@ -39,20 +46,27 @@ class Emitter:
         velocity = Vec3(random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5), random.uniform(-2, -1))
         #color = (random.random(), random.random(), random.random(), 1)
         lifespan = random.uniform(10, 12)
-        return Particle(position, velocity, self.color, lifespan, self.emitter_id)
+        return Particle(position, velocity, self.color, lifespan, self.emitter_id, self.interacting)
 
 
 class ParticleSystem:
-    def __init__(self, parent_node, emitters, max_particles=1500):
+    def __init__(self, parent_node, emitters, max_particles=1500, history_bytes=32 * 1024 * 1024):
         self.particles = []
         self.emitters = emitters
         self.parent_node = parent_node
         self.max_particles = max_particles
         self.gravity = Vec3(0, 0, 9.8)
         self.external_force = Vec3(0, 0, 0)
+        self.force_field = None
+        self.field_sample_interval = 4 #every particle samples the force field once per this many frames
+        self.field_frame = 0
+        self.interaction = None
         self.particle_nodes = []
         self.ground_areas = [(-10, 10, -10, 10)]
 
+        self.next_id = 0
+        self.history = RewindBuffer(max_bytes=history_bytes, stride=14)
+
         self.particle_model = loader.loadModel("models/misc/sphere")
         self.particle_model.setScale(0.1)
 
@@ -61,10 +75,32 @@ class ParticleSystem:
             for _ in range(int(emitter.rate * dt)):
                 if len(self.particles) < self.max_particles:
                     particle = emitter.emit()
+                    particle.id = self.next_id
+                    self.next_id += 1
                     node = self.create_particle_node(particle)
                     self.particles.append(particle)
                     self.particle_nodes.append(node)
 
+        if self.force_field:
+            self.force_field.advance(dt)
+            self.field_frame += 1
+            stale = [i for i, p in enumerate(self.particles)
+                     if p.field_force is None or (i + self.field_frame) % self.field_sample_interval == 0]
+            field_forces = self.force_field.sample_many(
+                [(self.particles[i].position.x, self.particles[i].position.y, self.particles[i].position.z) for i in stale]
+            )
+            for i, field_force in zip(stale, field_forces):
+                self.particles[i].field_force = Vec3(*field_force)
+
+        interaction_forces = {}
+        if self.interaction:
+            interacting = [i for i, p in enumerate(self.particles) if p.interacting]
+            accelerations = self.interaction.accelerations(
+                [tuple(self.particles[i].position) for i in interacting],
+                [tuple(self.particles[i].velocity) for i in interacting],
+            )
+            interaction_forces = dict(zip(interacting, accelerations))
+
         for i in reversed(range(len(self.particles))):
             particle = self.particles[i]
             particle.age += dt
@@ -74,10 +110,16 @@ class ParticleSystem:
                 self.particle_nodes[i].removeNode()
                 self.particle_nodes.pop(i)
             else:
+                force = self.external_force
+                if self.force_field:
+                    force = force + particle.field_force
+                if i in interaction_forces:
+                    force = force + Vec3(*interaction_forces[i])
+
                 if particle.emitter_id == 1:
-                    particle.velocity += (Vec3(0, 0, -9.8) + self.external_force) * dt
+                    particle.velocity += (Vec3(0, 0, -9.8) + force) * dt
                 else:
-                    particle.velocity += (self.gravity + self.external_force) * dt
+                    particle.velocity += (self.gravity + force) * dt
 
                 particle.position += particle.velocity * dt
 
@@ -92,6 +134,36 @@ class ParticleSystem:
 
                 self.particle_nodes[i].setPos(particle.position)
 
+        self.history.record(*self.snapshot(), dt)
+
+    def snapshot(self):
+        ids = []
+        values = []
+        for particle in self.particles:
+            ids.append(particle.id)
+            color = tuple(particle.color) + (1,) * (4 - len(particle.color))
+            values.extend((*particle.position, *particle.velocity, *color,
+                           particle.age, particle.lifespan, particle.emitter_id, particle.interacting))
+        return ids, values
+
+    def restore(self, ids, values):
+        count = len(ids)
+        while len(self.particle_nodes) > count:
+            self.particle_nodes.pop().removeNode()
+
+        self.particles = []
+        for n in range(count):
+            x, y, z, vx, vy, vz, r, g, b, a, age, lifespan, emitter_id, interacting = values[n * 14:(n + 1) * 14]
+            particle = Particle((x, y, z), (vx, vy, vz), (r, g, b, a), lifespan, round(emitter_id), bool(round(interacting)))
+            particle.age = age
+            particle.id = ids[n]
+            self.particles.append(particle)
+            if n < len(self.particle_nodes):
+                self.particle_nodes[n].setPos(particle.position)
+                self.particle_nodes[n].setColor(*particle.color)
+            else:
+                self.particle_nodes.append(self.create_particle_node(particle))
+
     def create_particle_node(self, particle):
         node = self.particle_model.copyTo(self.parent_node)
         node.setPos(particle.position)
@@ -118,10 +190,11 @@ class ParticleApp(ShowBase):
 
 
         emitter1 = Emitter(position=(0, 0, 10), rate=100, emitter_id=1, color=(255,255,255), area_size=(-9, 9, -9, 9))
-        emitter2 = Emitter(position=(5, 5, 0.5), rate=100, emitter_id=0, color=(0,0,0))
-        emitter3 = Emitter(position=(5, 5, 0.5), rate=50, emitter_id=0, color=(1, 0.5, 0, 1))
+        emitter2 = Emitter(position=(5, 5, 0.5), rate=100, emitter_id=0, color=(0,0,0), interacting=True)
+        emitter3 = Emitter(position=(5, 5, 0.5), rate=50, emitter_id=0, color=(1, 0.5, 0, 1), interacting=True)
 
         self.particle_system = ParticleSystem(self.render, [emitter1, emitter2, emitter3])
+        self.particle_system.interaction = ParticleInteraction(radius=0.5, rest_density=4.0, stiffness=2.0, viscosity=1.0)
 
         light = PointLight("point_light")
         light_node = self.render.attachNewNode(light)
@@ -133,6 +206,7 @@ class ParticleApp(ShowBase):
 
         self.fireplace = Fireplace(self.render, position=Vec3(5, 5, -0.5))
 
+        self.wind_field = self.create_wind_field()
 
         #self.sphere_radius = 1
         #self.sphere_position = Vec3(2, 2, 1)
@@ -145,6 +219,14 @@ class ParticleApp(ShowBase):
         self.wind_active = False
         self.accept("w", self.toggle_wind)
 
+        self.paused = False
+        self.history_cursor = 0
+        self.accept("p", self.toggle_pause)
+        self.accept(",", self.scrub, [-1])
+        self.accept(".", self.scrub, [1])
+        self.accept("[", self.scrub, [-60])
+        self.accept("]", self.scrub, [60])
+
         self.info_text = OnscreenText(
             text="",
             pos=(-1.2, 0.9),
@@ -167,9 +249,32 @@ class ParticleApp(ShowBase):
         ground.setHpr(0, -90, 0)
         ground.setColor(0.2, 0.8, 0.2, 1)
 
+    def create_wind_field(self):
+        wind_field = ForceField(bounds=(-10, 10, -10, 10, 0, 12), cell_size=1.0)
+        wind_field.add_uniform((5, 0, 0))
+        wind_field.add_vortex(center=(0, 0, 0), radius=3, strength=4, height=self.tree.tree_height + 8)
+        wind_field.add_updraft(center=self.fireplace.position, radius=1, strength=6, height=8)
+        wind_field.set_curl_noise(strength=3, scale=6, speed=0.5, slices_per_update=1)
+        return wind_field
+
     def toggle_wind(self):
         self.wind_active = not self.wind_active
 
+    def toggle_pause(self):
+        history = self.particle_system.history
+        if self.paused:
+            history.truncate(self.history_cursor)
+        else:
+            self.history_cursor = len(history) - 1
+        self.paused = not self.paused
+
+    def scrub(self, frames):
+        history = self.particle_system.history
+        if not self.paused or len(history) == 0:
+            return
+        self.history_cursor = min(max(self.history_cursor + frames, 0), len(history) - 1)
+        self.particle_system.restore(*history.frame(self.history_cursor))
+
     def rotate_camera_around_center(self, task):
         dt = globalClock.getDt()
         self.camera_angle += self.camera_speed * dt
@@ -190,16 +295,22 @@ class ParticleApp(ShowBase):
         if self.wind_active:
             #wind_force = (self.sphere_position - self.particle_system.emitters[0].position).normalized() * 20
             #self.particle_system.external_force = wind_force
-            self.particle_system.external_force = Vec3(5, 0, 0)
+            self.particle_system.force_field = self.wind_field
         else:
-            self.particle_system.external_force = Vec3(0, 0, 0)
+            self.particle_system.force_field = None
 
-        self.particle_system.update(dt, ground_level=0, collider_position=Vec3(0, 0, -10), collider_radius=0)
+        if not self.paused:
+            self.particle_system.update(dt, ground_level=0, collider_position=Vec3(0, 0, -10), collider_radius=0)
 
         num_particles = len(self.particle_system.particles)
         wind_status = "ON" if self.wind_active else "OFF"
+        history = self.particle_system.history
+        history_status = f"{history.seconds():.1f} s"
+        if self.paused:
+            history_status += f" (Paused, frame {self.history_cursor + 1}/{len(history)})"
         self.info_text.setText(
             f"Particles: {num_particles}\nPress 'W' to toggle wind\nWind: {wind_status}"
+            f"\nPress 'P' to pause, ',' '.' '[' ']' to scrub\nHistory: {history_status}"
         )
 
         return Task.cont
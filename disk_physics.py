@@ -0,0 +1,270 @@
+import math
+import random
+
+
+def check_collision(disk1, disk2):
+    dx = disk2['x'] - disk1['x']
+    dy = disk2['y'] - disk1['y']
+    distance = math.sqrt(dx**2 + dy**2)
+    return distance < disk1['radius'] + disk2['radius']
+
+def resolve_collision(disk1, disk2):
+    dx = disk2['x'] - disk1['x']
+    dy = disk2['y'] - disk1['y']
+    distance = math.sqrt(dx**2 + dy**2)
+
+    if distance == 0:
+        return
+
+    nx = dx / distance
+    ny = dy / distance
+
+    tx = -ny
+    ty = nx
+
+    v1n = disk1['vx'] * nx + disk1['vy'] * ny
+    v1t = disk1['vx'] * tx + disk1['vy'] * ty
+    v2n = disk2['vx'] * nx + disk2['vy'] * ny
+    v2t = disk2['vx'] * tx + disk2['vy'] * ty
+
+    m1, m2 = disk1['mass'], disk2['mass']
+    v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
+    v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
+
+    disk1['vx'] = v1n_new * nx + v1t * tx
+    disk1['vy'] = v1n_new * ny + v1t * ty
+    disk2['vx'] = v2n_new * nx + v2t * tx
+    disk2['vy'] = v2n_new * ny + v2t * ty
+
+    overlap = 0.5 * (disk1['radius'] + disk2['radius'] - distance)
+    disk1['x'] -= overlap * nx
+    disk1['y'] -= overlap * ny
+    disk2['x'] += overlap * nx
+    disk2['y'] += overlap * ny
+
+def resolve_static_collision(disk, obstacle):
+    dx = obstacle['x'] - disk['x']
+    dy = obstacle['y'] - disk['y']
+    distance = math.sqrt(dx**2 + dy**2)
+
+    if distance == 0:
+        return
+
+    nx = dx / distance
+    ny = dy / distance
+
+    #the obstacle is asleep, so it does not move and the approaching part of the velocity is removed
+    vn = disk['vx'] * nx + disk['vy'] * ny
+    if vn > 0:
+        disk['vx'] -= vn * nx
+        disk['vy'] -= vn * ny
+
+    overlap = disk['radius'] + obstacle['radius'] - distance
+    disk['x'] -= overlap * nx
+    disk['y'] -= overlap * ny
+
+
+class DiskSimulation:
+    def __init__(self, N=100, G=10, M=200, density_scale=0.5, speed_limit=2.0, radius_limit=10,
+                 width=1960, height=1080, collisions_enabled=True, seed=None):
+        self.N = N
+        self.G = G
+        self.M = M
+        self.density_scale = density_scale
+        self.speed_limit = speed_limit
+        self.radius_limit = radius_limit
+        self.width = width
+        self.height = height
+        self.collisions_enabled = collisions_enabled
+        self.cx, self.cy = width / 2, height / 2
+        #a supported disk that stays within sleep_distance of one spot for sleep_steps steps falls asleep,
+        #speed alone does not work: a resting pile near the center jitters fast while going nowhere
+        self.sleep_distance = 1.0
+        self.sleep_steps = 30
+        self.sleep_balance = 0.25 #an island is supported when its net gravity is below this share of the total
+        self.wake_speed = 3.0 #a sleeping disk is woken only by a contact approaching faster than this
+        self.cell_size = 2 * radius_limit
+        self.sleeping_grid = None
+        self.rng = random.Random(seed)
+        self.disks = self.generate_disks(N)
+
+    def generate_disks(self, N):
+        self.sleeping_grid = None
+        rng = self.rng
+        disks = []
+        for _ in range(N):
+            radius = rng.randint(5, self.radius_limit)
+            mass = rng.uniform(1, 5)
+            x = rng.uniform(radius, self.width - radius)
+            y = rng.uniform(radius, self.height - radius)
+            vx = rng.uniform(-self.speed_limit, self.speed_limit)
+            vy = rng.uniform(-self.speed_limit, self.speed_limit)
+            color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+            disks.append({'x': x, 'y': y, 'vx': vx, 'vy': vy, 'radius': radius, 'mass': mass, 'color': color,
+                          'gx': 0, 'gy': 0, 'sleeping': False, 'still_steps': 0})
+        return disks
+
+    def reset(self, N=None):
+        if N is not None:
+            self.N = N
+        self.disks = self.generate_disks(self.N)
+
+    def get_density(self, r):
+        max_density = 0.01
+        radius = 200
+        if r < radius:
+            return max_density
+        else:
+            return max_density * max(0, (1 - (r - radius) / radius) * self.density_scale)
+
+    def update_position(self, disk, dt):
+        r = math.sqrt((disk['x'] - self.cx) ** 2 + (disk['y'] - self.cy) ** 2)
+        density = self.get_density(r)
+        if r != 0:
+            fx = -self.G * self.M * (disk['x'] - self.cx) * disk['mass'] / (r**3 + 1000)
+            fy = -self.G * self.M * (disk['y'] - self.cy) * disk['mass'] / (r**3 + 1000)
+            resistance_fx = -6 * math.pi * disk['vx'] * density * disk['radius']
+            resistance_fy = -6 * math.pi * disk['vy'] * density * disk['radius']
+            ax = fx / disk['mass'] + resistance_fx
+            ay = fy / disk['mass'] + resistance_fy
+            disk['vx'] += ax * dt
+            disk['vy'] += ay * dt
+            #kept for the sleep test, drag is left out because it also cancels gravity for a disk drifting at terminal speed
+            disk['gx'] = fx
+            disk['gy'] = fy
+
+        disk['x'] += disk['vx'] * dt
+        disk['y'] += disk['vy'] * dt
+
+        if disk['x'] - disk['radius'] < 0 or disk['x'] + disk['radius'] > self.width:
+            disk['vx'] *= -1
+        if disk['y'] - disk['radius'] < 0 or disk['y'] + disk['radius'] > self.height:
+            disk['vy'] *= -1
+
+    def wake(self, disk):
+        if disk['sleeping']:
+            self.sleeping_grid = None
+        disk['sleeping'] = False
+        disk['still_steps'] = 0
+
+    def wake_all(self):
+        for disk in self.disks:
+            self.wake(disk)
+
+    def put_to_sleep(self, disk):
+        self.sleeping_grid = None
+        disk['sleeping'] = True
+        disk['vx'] = 0
+        disk['vy'] = 0
+
+    def build_grid(self, indices):
+        grid = {}
+        for i in indices:
+            key = (int(self.disks[i]['x'] // self.cell_size), int(self.disks[i]['y'] // self.cell_size))
+            grid.setdefault(key, []).append(i)
+        return grid
+
+    def find_contacts(self, awake, awake_grid):
+        disks = self.disks
+        contacts = []
+        static_contacts = []
+        for i in awake:
+            disk1 = disks[i]
+            kx = int(disk1['x'] // self.cell_size)
+            ky = int(disk1['y'] // self.cell_size)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for j in awake_grid.get((kx + dx, ky + dy), ()):
+                        if j > i and check_collision(disk1, disks[j]):
+                            contacts.append((i, j))
+                    for j in self.sleeping_grid.get((kx + dx, ky + dy), ()):
+                        if check_collision(disk1, disks[j]):
+                            static_contacts.append((i, j))
+        return contacts, static_contacts
+
+    def build_islands(self, awake, contacts, static_contacts):
+        #sleeping disks are static obstacles, like walls they are left out of the islands
+        parent = {i: i for i in awake}
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in contacts:
+            parent[find(i)] = find(j)
+
+        islands = {}
+        for i in awake:
+            islands.setdefault(find(i), ([], [], []))[0].append(i)
+        for i, j in contacts:
+            islands[find(i)][1].append((i, j))
+        for i, j in static_contacts:
+            islands[find(i)][2].append((i, j))
+        return list(islands.values())
+
+    def is_supported(self, members, contacts, static_contacts):
+        if static_contacts:
+            return True
+        if not contacts:
+            return False
+        #a falling group has all gravity forces pointing the same way, in a pile around the center they cancel out
+        net_x = sum(self.disks[i]['gx'] for i in members)
+        net_y = sum(self.disks[i]['gy'] for i in members)
+        total = sum(math.sqrt(self.disks[i]['gx'] ** 2 + self.disks[i]['gy'] ** 2) for i in members)
+        return math.sqrt(net_x ** 2 + net_y ** 2) <= self.sleep_balance * total
+
+    def step(self, dt):
+        disks = self.disks
+        awake = [i for i, disk in enumerate(disks) if not disk['sleeping']]
+        for i in awake:
+            self.update_position(disks[i], dt)
+
+        contacts = []
+        static_contacts = []
+        if self.collisions_enabled:
+            if self.sleeping_grid is None:
+                self.sleeping_grid = self.build_grid([i for i, disk in enumerate(disks) if disk['sleeping']])
+            contacts, static_contacts = self.find_contacts(awake, self.build_grid(awake))
+
+        for members, island_contacts, island_static_contacts in self.build_islands(awake, contacts, static_contacts):
+            for i, j in island_contacts:
+                resolve_collision(disks[i], disks[j])
+
+            for i, j in island_static_contacts:
+                disk1, disk2 = disks[i], disks[j]
+                if disk2['sleeping']:
+                    distance = math.sqrt((disk2['x'] - disk1['x']) ** 2 + (disk2['y'] - disk1['y']) ** 2)
+                    if distance > 0:
+                        #the push gravity gave this step is left out, a disk resting on a sleeper is not an impact
+                        vx = disk1['vx'] - disk1['gx'] / disk1['mass'] * dt
+                        vy = disk1['vy'] - disk1['gy'] / disk1['mass'] * dt
+                        approach = (vx * (disk2['x'] - disk1['x']) + vy * (disk2['y'] - disk1['y'])) / distance
+                        if approach > self.wake_speed:
+                            self.wake(disk2)
+                if disk2['sleeping']:
+                    resolve_static_collision(disk1, disk2)
+                else:
+                    resolve_collision(disk1, disk2)
+
+            supported = self.is_supported(members, island_contacts, island_static_contacts)
+            for i in members:
+                disk = disks[i]
+                if disk['still_steps'] > 0 and (disk['x'] - disk['anchor_x']) ** 2 + (disk['y'] - disk['anchor_y']) ** 2 >= self.sleep_distance ** 2:
+                    disk['still_steps'] = 0
+                #contacts in a bouncing pile come and go, so a step without support only pauses the count
+                if supported:
+                    if disk['still_steps'] == 0:
+                        disk['anchor_x'] = disk['x']
+                        disk['anchor_y'] = disk['y']
+                    disk['still_steps'] += 1
+
+            #the still part of a supported island goes to sleep even while newcomers still bounce on it,
+            #the sleepers then act as static obstacles the newcomers settle against
+            if supported:
+                for i in members:
+                    if disks[i]['still_steps'] >= self.sleep_steps:
+                        self.put_to_sleep(disks[i])
+
+        return len(contacts) + len(static_contacts)
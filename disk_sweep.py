@@ -0,0 +1,135 @@
+import csv
+import itertools
+import math
+import os
+import sys
+from multiprocessing import Pool
+
+from disk_physics import DiskSimulation
+
+DEFAULT_PARAMS = {
+    'N': 100,
+    'G': 10,
+    'M': 200,
+    'density_scale': 0.5,
+    'speed_limit': 2.0,
+    'radius_limit': 10,
+    'collisions_enabled': True,
+    'steps': 1000,
+    'dt': 0.5,
+    'sample_every': 10,
+    'settle_window': 10,
+    'settle_tolerance': 0.1,
+    'escape_radius': 400,
+}
+
+
+def kinetic_energy(disks):
+    return sum(0.5 * disk['mass'] * (disk['vx'] ** 2 + disk['vy'] ** 2) for disk in disks)
+
+
+def settling_time(energy_curve, settle_window, settle_tolerance, sample_every, dt):
+    # the plateau is the mean energy of the last settle_window samples, the run has settled from
+    # the first sample after which the energy stays within settle_tolerance of that plateau
+    if len(energy_curve) < settle_window:
+        return None
+    plateau = sum(energy_curve[-settle_window:]) / settle_window
+    band = settle_tolerance * plateau
+    settled_at = None
+    for n, energy in enumerate(energy_curve):
+        if abs(energy - plateau) > band:
+            settled_at = None
+        elif settled_at is None:
+            settled_at = n
+    if settled_at is None:
+        return None
+    return settled_at * sample_every * dt
+
+
+def escaped_disks(simulation, escape_radius):
+    # outside escape_radius the 1000 softening in the force is negligible, so the potential is -G * M / r
+    escaped = 0
+    for disk in simulation.disks:
+        r = math.sqrt((disk['x'] - simulation.cx) ** 2 + (disk['y'] - simulation.cy) ** 2)
+        if r > escape_radius and 0.5 * (disk['vx'] ** 2 + disk['vy'] ** 2) - simulation.G * simulation.M / r > 0:
+            escaped += 1
+    return escaped
+
+
+def run_simulation(params):
+    params = dict(DEFAULT_PARAMS, **params)
+    simulation = DiskSimulation(N=params['N'], G=params['G'], M=params['M'], density_scale=params['density_scale'],
+                                speed_limit=params['speed_limit'], radius_limit=params['radius_limit'],
+                                collisions_enabled=params['collisions_enabled'], seed=params['seed'])
+    disks = simulation.disks
+    dt = params['dt']
+
+    energy_curve = []
+    collisions = 0
+    for step in range(params['steps']):
+        if step % params['sample_every'] == 0:
+            energy_curve.append(kinetic_energy(disks))
+        collisions += simulation.step(dt)
+    energy_curve.append(kinetic_energy(disks))
+
+    result = {key: params[key] for key in ('seed', 'N', 'G', 'M', 'density_scale', 'speed_limit', 'radius_limit')}
+    result.update({
+        'settling_time': settling_time(energy_curve, params['settle_window'], params['settle_tolerance'],
+                                       params['sample_every'], dt),
+        'final_energy': energy_curve[-1],
+        'collision_rate': collisions / max(1, params['steps']),
+        'escaped': escaped_disks(simulation, params['escape_radius']),
+        'energy_curve': energy_curve,
+    })
+    return result
+
+
+def parameter_grid(**values):
+    keys = list(values)
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values.values())]
+
+
+def run_sweep(param_sets, processes=None, base_seed=0):
+    runs = []
+    for n, params in enumerate(param_sets):
+        params = dict(params)
+        params.setdefault('seed', base_seed + n)
+        runs.append(params)
+    with Pool(processes or os.cpu_count()) as pool:
+        return pool.map(run_simulation, runs, chunksize=1)
+
+
+def write_table(results, path):
+    columns = [key for key in results[0] if key != 'energy_curve'] + ['energy_curve']
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for result in results:
+            row = [result[key] for key in columns[:-1]]
+            row.append(' '.join(f"{energy:.3f}" for energy in result['energy_curve']))
+            writer.writerow(row)
+
+
+def print_table(results):
+    print(f"{'seed':>5} {'G':>5} {'M':>6} {'density':>8} {'speed':>6} {'radius':>6} "
+          f"{'settle':>8} {'energy':>10} {'coll/step':>9} {'escaped':>7}")
+    for result in results:
+        settle = result['settling_time']
+        print(f"{result['seed']:>5} {result['G']:>5} {result['M']:>6} {result['density_scale']:>8.2f} "
+              f"{result['speed_limit']:>6.2f} {result['radius_limit']:>6} "
+              f"{'-' if settle is None else f'{settle:.1f}':>8} {result['final_energy']:>10.2f} "
+              f"{result['collision_rate']:>9.3f} {result['escaped']:>7}")
+
+
+if __name__ == "__main__":
+    param_sets = parameter_grid(
+        G=[5, 10, 20],
+        M=[100, 200, 400],
+        density_scale=[0.25, 0.5, 1.0],
+        speed_limit=[1.0, 2.0],
+        radius_limit=[10],
+    )
+    results = run_sweep(param_sets)
+    print_table(results)
+    if len(sys.argv) > 1:
+        write_table(results, sys.argv[1])
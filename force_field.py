@@ -0,0 +1,204 @@
+import math
+import random
+
+
+class ForceField:
+    def __init__(self, bounds, cell_size=1.0):
+        self.x_min, self.x_max, self.y_min, self.y_max, self.z_min, self.z_max = bounds
+        self.cell_size = cell_size
+        self.nx = max(2, int(math.ceil((self.x_max - self.x_min) / cell_size)) + 1)
+        self.ny = max(2, int(math.ceil((self.y_max - self.y_min) / cell_size)) + 1)
+        self.nz = max(2, int(math.ceil((self.z_max - self.z_min) / cell_size)) + 1)
+        size = self.nx * self.ny * self.nz
+
+        # base = static generators, turbulence = animated curl noise, fx/fy/fz = base + turbulence
+        self.base_x = [0.0] * size
+        self.base_y = [0.0] * size
+        self.base_z = [0.0] * size
+        self.turb_x = [0.0] * size
+        self.turb_y = [0.0] * size
+        self.turb_z = [0.0] * size
+        self.fx = [0.0] * size
+        self.fy = [0.0] * size
+        self.fz = [0.0] * size
+
+        self.time = 0
+        self.noise_waves = []
+        self.noise_cos = []
+        self.noise_sin = []
+        self.noise_speed = 0
+        self.slices_per_update = 1
+        self.next_slice = 0
+
+    def index(self, i, j, k):
+        return (k * self.ny + j) * self.nx + i
+
+    def node_position(self, i, j, k):
+        return (self.x_min + i * self.cell_size,
+                self.y_min + j * self.cell_size,
+                self.z_min + k * self.cell_size)
+
+    def add_uniform(self, force):
+        for n in range(len(self.base_x)):
+            self.base_x[n] += force[0]
+            self.base_y[n] += force[1]
+            self.base_z[n] += force[2]
+        self.rebuild()
+
+    def add_vortex(self, center, radius, strength, height=None):
+        for k in range(self.nz):
+            for j in range(self.ny):
+                for i in range(self.nx):
+                    x, y, z = self.node_position(i, j, k)
+                    if height is not None and not center[2] <= z <= center[2] + height:
+                        continue
+                    dx = x - center[0]
+                    dy = y - center[1]
+                    r = math.sqrt(dx ** 2 + dy ** 2)
+                    if r == 0 or r > radius * 3:
+                        continue
+                    # tangential swirl peaking at the vortex radius and fading outside of it
+                    falloff = r / radius if r < radius else math.exp(-(r - radius) / radius)
+                    n = self.index(i, j, k)
+                    self.base_x[n] += -dy / r * strength * falloff
+                    self.base_y[n] += dx / r * strength * falloff
+        self.rebuild()
+
+    def add_updraft(self, center, radius, strength, height):
+        for k in range(self.nz):
+            for j in range(self.ny):
+                for i in range(self.nx):
+                    x, y, z = self.node_position(i, j, k)
+                    if not center[2] <= z <= center[2] + height:
+                        continue
+                    r2 = (x - center[0]) ** 2 + (y - center[1]) ** 2
+                    if r2 > (radius * 2) ** 2:
+                        continue
+                    fade = 1 - (z - center[2]) / height
+                    n = self.index(i, j, k)
+                    self.base_z[n] += strength * math.exp(-r2 / radius ** 2) * fade
+        self.rebuild()
+
+    def set_curl_noise(self, strength, scale, speed, octaves=4, slices_per_update=1, seed=None):
+        rng = random.Random(seed)
+        self.noise_waves = []
+        self.noise_cos = []
+        self.noise_sin = []
+        self.noise_speed = speed
+        self.slices_per_update = max(1, slices_per_update)
+        # vector potential built from random plane waves, so its curl is known analytically
+        for _ in range(3 * octaves):
+            kx, ky, kz = rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1)
+            length = math.sqrt(kx ** 2 + ky ** 2 + kz ** 2) or 1
+            wave_number = 2 * math.pi / scale
+            wave = (
+                kx / length * wave_number,
+                ky / length * wave_number,
+                kz / length * wave_number,
+                rng.uniform(0, 2 * math.pi),
+                rng.uniform(0.5, 1.5),
+                strength / (wave_number * octaves),
+            )
+            self.noise_waves.append(wave)
+            # the spatial part of every wave is fixed, only the time phase changes between refreshes
+            cos_slices = []
+            sin_slices = []
+            for k in range(self.nz):
+                phases = [wave[0] * x + wave[1] * y + wave[2] * z + wave[3]
+                          for x, y, z in (self.node_position(i, j, k) for j in range(self.ny) for i in range(self.nx))]
+                cos_slices.append([math.cos(a) for a in phases])
+                sin_slices.append([math.sin(a) for a in phases])
+            self.noise_cos.append(cos_slices)
+            self.noise_sin.append(sin_slices)
+        for k in range(self.nz):
+            self.update_turbulence_slice(k)
+
+    def update_turbulence_slice(self, k):
+        start = k * self.nx * self.ny
+        end = start + self.nx * self.ny
+        tx = ty = tz = [0.0] * (end - start)
+        t = self.time * self.noise_speed
+        # noise_waves holds three interleaved potential components psi_x, psi_y, psi_z,
+        # each adds its derivatives to the two curl components it appears in
+        for w, (kx, ky, kz, phase, freq, amp) in enumerate(self.noise_waves):
+            ct = amp * math.cos(freq * t)
+            st = amp * math.sin(freq * t)
+            c = [ca * ct - sa * st for ca, sa in zip(self.noise_cos[w][k], self.noise_sin[w][k])]
+            if w % 3 == 0:
+                ty = [v + ci * kz for v, ci in zip(ty, c)]
+                tz = [v - ci * ky for v, ci in zip(tz, c)]
+            elif w % 3 == 1:
+                tz = [v + ci * kx for v, ci in zip(tz, c)]
+                tx = [v - ci * kz for v, ci in zip(tx, c)]
+            else:
+                tx = [v + ci * ky for v, ci in zip(tx, c)]
+                ty = [v - ci * kx for v, ci in zip(ty, c)]
+        self.turb_x[start:end] = tx
+        self.turb_y[start:end] = ty
+        self.turb_z[start:end] = tz
+        self.fx[start:end] = [b + v for b, v in zip(self.base_x[start:end], tx)]
+        self.fy[start:end] = [b + v for b, v in zip(self.base_y[start:end], ty)]
+        self.fz[start:end] = [b + v for b, v in zip(self.base_z[start:end], tz)]
+
+    def rebuild(self):
+        for n in range(len(self.fx)):
+            self.fx[n] = self.base_x[n] + self.turb_x[n]
+            self.fy[n] = self.base_y[n] + self.turb_y[n]
+            self.fz[n] = self.base_z[n] + self.turb_z[n]
+
+    def advance(self, dt):
+        self.time += dt
+        if not self.noise_waves:
+            return
+        # refresh only a few z-slices per frame, the whole grid is refreshed every nz / slices_per_update frames
+        for _ in range(min(self.slices_per_update, self.nz)):
+            self.update_turbulence_slice(self.next_slice)
+            self.next_slice = (self.next_slice + 1) % self.nz
+
+    def sample(self, position):
+        return self.sample_many([position])[0]
+
+    def sample_many(self, positions):
+        fx, fy, fz = self.fx, self.fy, self.fz
+        nx, ny, nz = self.nx, self.ny, self.nz
+        stride_y = nx
+        stride_z = nx * ny
+        inv_cell = 1 / self.cell_size
+        x_min, y_min, z_min = self.x_min, self.y_min, self.z_min
+        max_x, max_y, max_z = nx - 1.000001, ny - 1.000001, nz - 1.000001
+
+        forces = []
+        for x, y, z in positions:
+            gx = min(max((x - x_min) * inv_cell, 0), max_x)
+            gy = min(max((y - y_min) * inv_cell, 0), max_y)
+            gz = min(max((z - z_min) * inv_cell, 0), max_z)
+            i, j, k = int(gx), int(gy), int(gz)
+            tx, ty, tz = gx - i, gy - j, gz - k
+
+            n000 = k * stride_z + j * stride_y + i
+            n100 = n000 + 1
+            n010 = n000 + stride_y
+            n110 = n010 + 1
+            n001 = n000 + stride_z
+            n101 = n001 + 1
+            n011 = n001 + stride_y
+            n111 = n011 + 1
+
+            w000 = (1 - tx) * (1 - ty) * (1 - tz)
+            w100 = tx * (1 - ty) * (1 - tz)
+            w010 = (1 - tx) * ty * (1 - tz)
+            w110 = tx * ty * (1 - tz)
+            w001 = (1 - tx) * (1 - ty) * tz
+            w101 = tx * (1 - ty) * tz
+            w011 = (1 - tx) * ty * tz
+            w111 = tx * ty * tz
+
+            forces.append((
+                fx[n000] * w000 + fx[n100] * w100 + fx[n010] * w010 + fx[n110] * w110
+                + fx[n001] * w001 + fx[n101] * w101 + fx[n011] * w011 + fx[n111] * w111,
+                fy[n000] * w000 + fy[n100] * w100 + fy[n010] * w010 + fy[n110] * w110
+                + fy[n001] * w001 + fy[n101] * w101 + fy[n011] * w011 + fy[n111] * w111,
+                fz[n000] * w000 + fz[n100] * w100 + fz[n010] * w010 + fz[n110] * w110
+                + fz[n001] * w001 + fz[n101] * w101 + fz[n011] * w011 + fz[n111] * w111,
+            ))
+        return forces
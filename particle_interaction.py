@@ -0,0 +1,133 @@
+import math
+
+
+# half of the 26 neighbouring cells, every pair of cells is visited only once
+HALF_NEIGHBOR_OFFSETS = [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+
+class NeighborGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.order = []
+        self.cells = {}
+
+    def build(self, xs, ys, zs):
+        # particles sorted by cell, every cell is one contiguous (start, end) range of self.order
+        inv_cell = 1 / self.cell_size
+        keys = [(math.floor(x * inv_cell), math.floor(y * inv_cell), math.floor(z * inv_cell))
+                for x, y, z in zip(xs, ys, zs)]
+        self.order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.cells = {}
+        start = 0
+        for n in range(1, len(self.order) + 1):
+            if n == len(self.order) or keys[self.order[n]] != keys[self.order[start]]:
+                self.cells[keys[self.order[start]]] = (start, n)
+                start = n
+        return keys
+
+
+class ParticleInteraction:
+    def __init__(self, radius=0.5, rest_density=4.0, stiffness=2.0, viscosity=1.0,
+                 max_neighbors=12, max_particles=300):
+        self.radius = radius
+        self.rest_density = rest_density
+        self.stiffness = stiffness
+        self.viscosity = viscosity
+        # a packed plume would otherwise make the neighbour search quadratic
+        self.max_neighbors = max_neighbors
+        # pure Python budget, only the newest max_particles interact, see the frame cost in the git log
+        self.max_particles = max_particles
+        self.grid = NeighborGrid(radius)
+
+    def accelerations(self, positions, velocities):
+        total = len(positions)
+        skipped = max(0, total - self.max_particles)
+        positions = positions[skipped:]
+        velocities = velocities[skipped:]
+        count = len(positions)
+        if count == 0:
+            return [(0.0, 0.0, 0.0)] * total
+
+        xs = [p[0] for p in positions]
+        ys = [p[1] for p in positions]
+        zs = [p[2] for p in positions]
+        h = self.radius
+        h2 = h ** 2
+        inv_h = 1 / h
+        max_neighbors = self.max_neighbors
+        self.grid.build(xs, ys, zs)
+        order = self.grid.order
+        cells = self.grid.cells
+
+        # every neighbour pair is stored once in flat lists, a particle stops collecting at max_neighbors
+        pair_i = []
+        pair_j = []
+        pair_r = []
+        found = [0] * count
+        density = [1.0] * count
+        for (kx, ky, kz), (start, end) in cells.items():
+            others = []
+            for dx, dy, dz in HALF_NEIGHBOR_OFFSETS:
+                other = cells.get((kx + dx, ky + dy, kz + dz))
+                if other is not None:
+                    others.append(range(other[0], other[1]))
+            for a in range(start, end):
+                i = order[a]
+                xi, yi, zi = xs[i], ys[i], zs[i]
+                # the particle's own cell first, in a packed plume it alone fills max_neighbors
+                for candidates in [range(start, a)] + others:
+                    if found[i] >= max_neighbors:
+                        break
+                    for b in candidates:
+                        j = order[b]
+                        if found[j] >= max_neighbors:
+                            continue
+                        r2 = (xs[j] - xi) ** 2 + (ys[j] - yi) ** 2 + (zs[j] - zi) ** 2
+                        if r2 < h2:
+                            pair_i.append(i)
+                            pair_j.append(j)
+                            pair_r.append(math.sqrt(r2))
+                            w = (1 - r2 / h2) ** 3
+                            density[i] += w
+                            density[j] += w
+                            found[j] += 1
+                            found[i] += 1
+                            if found[i] >= max_neighbors:
+                                break
+
+        # negative pressure below rest density keeps the plume together, positive pushes it apart
+        stiffness = self.stiffness
+        rest_density = self.rest_density
+        pressure = [stiffness * (d - rest_density) for d in density]
+        viscosity = self.viscosity
+
+        ax = [0.0] * count
+        ay = [0.0] * count
+        az = [0.0] * count
+        for i, j, r in zip(pair_i, pair_j, pair_r):
+            if r == 0:
+                continue
+            q = 1 - r * inv_h
+            push = -0.5 * (pressure[i] + pressure[j]) * q * q / r
+            drag = viscosity * q
+            vi = velocities[i]
+            vj = velocities[j]
+            fx = push * (xs[j] - xs[i]) + drag * (vj[0] - vi[0])
+            fy = push * (ys[j] - ys[i]) + drag * (vj[1] - vi[1])
+            fz = push * (zs[j] - zs[i]) + drag * (vj[2] - vi[2])
+            inv_i = 1 / density[i]
+            inv_j = 1 / density[j]
+            ax[i] += fx * inv_i
+            ay[i] += fy * inv_i
+            az[i] += fz * inv_i
+            ax[j] -= fx * inv_j
+            ay[j] -= fy * inv_j
+            az[j] -= fz * inv_j
+
+        return [(0.0, 0.0, 0.0)] * skipped + list(zip(ax, ay, az))
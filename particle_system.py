@@ -5,6 +5,7 @@ from direct.task import Task
 from panda3d.core import TextNode
 import random
 import math
+from rewind import RewindBuffer
 
 
 class Particle:
@@ -15,6 +16,7 @@ class Particle:
         self.lifespan = lifespan
         self.age = 0
         self.emitter_id = emitter_id
+        self.id = None #given by the particle system, the rewind history tracks particles by it
 
 
 class Emitter:
@@ -31,7 +33,7 @@ class Emitter:
 
 
 class ParticleSystem:
-    def __init__(self, parent_node, emitters, max_particles=1500):
+    def __init__(self, parent_node, emitters, max_particles=1500, history_bytes=32 * 1024 * 1024):
         self.particles = []
         self.emitters = emitters
         self.parent_node = parent_node
@@ -40,6 +42,9 @@ class ParticleSystem:
         self.external_force = Vec3(0, 0, 0)
         self.particle_nodes = []
 
+        self.next_id = 0
+        self.history = RewindBuffer(max_bytes=history_bytes, stride=13)
+
         self.particle_model = loader.loadModel("models/misc/sphere")
         self.particle_model.setScale(0.1)
 
@@ -48,6 +53,8 @@ class ParticleSystem:
             for _ in range(int(emitter.rate * dt)):
                 if len(self.particles) < self.max_particles:
                     particle = emitter.emit()
+                    particle.id = self.next_id
+                    self.next_id += 1
                     node = self.create_particle_node(particle)
                     self.particles.append(particle)
                     self.particle_nodes.append(node)
@@ -79,6 +86,36 @@ class ParticleSystem:
 
                 self.particle_nodes[i].setPos(particle.position)
 
+        self.history.record(*self.snapshot(), dt)
+
+    def snapshot(self):
+        ids = []
+        values = []
+        for particle in self.particles:
+            ids.append(particle.id)
+            color = tuple(particle.color) + (1,) * (4 - len(particle.color))
+            values.extend((*particle.position, *particle.velocity, *color,
+                           particle.age, particle.lifespan, particle.emitter_id))
+        return ids, values
+
+    def restore(self, ids, values):
+        count = len(ids)
+        while len(self.particle_nodes) > count:
+            self.particle_nodes.pop().removeNode()
+
+        self.particles = []
+        for n in range(count):
+            x, y, z, vx, vy, vz, r, g, b, a, age, lifespan, emitter_id = values[n * 13:(n + 1) * 13]
+            particle = Particle((x, y, z), (vx, vy, vz), (r, g, b, a), lifespan, round(emitter_id))
+            particle.age = age
+            particle.id = ids[n]
+            self.particles.append(particle)
+            if n < len(self.particle_nodes):
+                self.particle_nodes[n].setPos(particle.position)
+                self.particle_nodes[n].setColor(*particle.color)
+            else:
+                self.particle_nodes.append(self.create_particle_node(particle))
+
     def create_particle_node(self, particle):
         node = self.particle_model.copyTo(self.parent_node)
         node.setPos(particle.position)
@@ -118,6 +155,14 @@ class ParticleApp(ShowBase):
         self.wind_active = False
         self.accept("w", self.toggle_wind)
 
+        self.paused = False
+        self.history_cursor = 0
+        self.accept("p", self.toggle_pause)
+        self.accept(",", self.scrub, [-1])
+        self.accept(".", self.scrub, [1])
+        self.accept("[", self.scrub, [-60])
+        self.accept("]", self.scrub, [60])
+
         self.info_text = OnscreenText(
             text="",
             pos=(-1.2, 0.9),
@@ -143,6 +188,21 @@ class ParticleApp(ShowBase):
     def toggle_wind(self):
         self.wind_active = not self.wind_active
 
+    def toggle_pause(self):
+        history = self.particle_system.history
+        if self.paused:
+            history.truncate(self.history_cursor)
+        else:
+            self.history_cursor = len(history) - 1
+        self.paused = not self.paused
+
+    def scrub(self, frames):
+        history = self.particle_system.history
+        if not self.paused or len(history) == 0:
+            return
+        self.history_cursor = min(max(self.history_cursor + frames, 0), len(history) - 1)
+        self.particle_system.restore(*history.frame(self.history_cursor))
+
     def rotate_camera_around_center(self, task):
         dt = globalClock.getDt()
         self.camera_angle += self.camera_speed * dt
@@ -164,12 +224,18 @@ class ParticleApp(ShowBase):
         else:
             self.particle_system.external_force = Vec3(0, 0, 0)
 
-        self.particle_system.update(dt, ground_level=0, collider_position=self.sphere_position, collider_radius=self.sphere_radius)
+        if not self.paused:
+            self.particle_system.update(dt, ground_level=0, collider_position=self.sphere_position, collider_radius=self.sphere_radius)
 
         num_particles = len(self.particle_system.particles)
         wind_status = "ON" if self.wind_active else "OFF"
+        history = self.particle_system.history
+        history_status = f"{history.seconds():.1f} s"
+        if self.paused:
+            history_status += f" (Paused, frame {self.history_cursor + 1}/{len(history)})"
         self.info_text.setText(
             f"Particles: {num_particles}\nPress 'W' to toggle wind\nWind: {wind_status}"
+            f"\nPress 'P' to pause, ',' '.' '[' ']' to scrub\nHistory: {history_status}"
         )
 
         return Task.cont
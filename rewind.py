@@ -0,0 +1,153 @@
+import struct
+from array import array
+from collections import deque
+
+
+class RewindBuffer:
+    def __init__(self, max_bytes, stride, keyframe_interval=30):
+        self.max_bytes = max_bytes
+        self.stride = stride #values stored per id
+        self.keyframe_interval = keyframe_interval
+        # one preallocated block, frames are written one after another and wrap around at the end
+        self.data = bytearray(max_bytes)
+        self.frames = deque()
+        self.write_pos = 0
+        self.last_ids = None
+        self.last_values = None
+        self.since_keyframe = 0
+        self.cache_index = None
+        self.cache_state = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def seconds(self):
+        return sum(frame['dt'] for frame in self.frames)
+
+    def clear(self):
+        self.frames.clear()
+        self.write_pos = 0
+        self.last_ids = None
+        self.last_values = None
+        self.cache_index = None
+        self.cache_state = None
+
+    def record(self, ids, values, dt):
+        # values holds stride values per id, ids have to stay the same for the lifetime of what they name
+        ids = list(ids)
+        stride = self.stride
+        if len(values) != len(ids) * stride:
+            raise ValueError("values do not match the ids")
+        keyframe = self.last_ids is None or self.since_keyframe >= self.keyframe_interval
+        if not keyframe:
+            # a delta frame lists the rows of the previous frame that died, the float16 deltas of the
+            # survivors in their previous order and the spawned ids with their full float32 values,
+            # deltas are taken against the decoded previous frame, so float16 rounding never accumulates
+            rows = {frame_id: n for n, frame_id in enumerate(ids)}
+            last_values = self.last_values
+            dead = []
+            kept_values = []
+            kept_last = []
+            for n, frame_id in enumerate(self.last_ids):
+                row = rows.pop(frame_id, None)
+                if row is None:
+                    dead.append(n)
+                else:
+                    kept_values += values[row * stride:(row + 1) * stride]
+                    kept_last += last_values[n * stride:(n + 1) * stride]
+            deltas = [v - last for v, last in zip(kept_values, kept_last)]
+            spawned = sorted(rows.values())
+            try:
+                payload = (array('I', dead).tobytes() + struct.pack(f"<{len(deltas)}e", *deltas)
+                           + array('I', [ids[row] for row in spawned]).tobytes()
+                           + array('f', [v for row in spawned for v in values[row * stride:(row + 1) * stride]]).tobytes())
+            except OverflowError:
+                keyframe = True
+        if not keyframe and not self.store(payload, False, len(dead), len(deltas) // stride, len(spawned), dt):
+            # the keyframe this delta depends on was overwritten
+            keyframe = True
+        if keyframe:
+            # a keyframe spawns everything
+            payload = array('I', ids).tobytes() + array('f', values).tobytes()
+            if len(payload) > self.max_bytes:
+                raise ValueError("frame does not fit in the rewind buffer")
+            self.store(payload, True, 0, 0, len(ids), dt)
+
+        self.last_ids, self.last_values = self.decode(self.frames[-1], self.last_ids, self.last_values)
+        self.since_keyframe = 0 if keyframe else self.since_keyframe + 1
+        self.cache_index = None
+
+    def store(self, payload, keyframe, dead, kept, spawned, dt):
+        size = len(payload)
+        start = self.write_pos
+        if start + size > self.max_bytes:
+            # the frames past the write position are the oldest ones and get dropped on wrap
+            while self.frames and self.frames[0]['offset'] >= start:
+                self.frames.popleft()
+            start = 0
+        end = start + size
+        while self.frames and self.frames[0]['offset'] < end and start < self.frames[0]['offset'] + self.frames[0]['size']:
+            self.frames.popleft()
+        # history has to start on a keyframe, deltas without their keyframe are useless
+        while self.frames and not self.frames[0]['keyframe']:
+            self.frames.popleft()
+        if not keyframe and not self.frames:
+            return False
+
+        self.data[start:end] = payload
+        self.frames.append({'offset': start, 'size': size, 'keyframe': keyframe,
+                            'dead': dead, 'kept': kept, 'spawned': spawned, 'dt': dt})
+        self.write_pos = end
+        return True
+
+    def decode(self, frame, ids, values):
+        stride = self.stride
+        payload = self.data[frame['offset']:frame['offset'] + frame['size']]
+        if frame['keyframe']:
+            ids, values = [], []
+        id_size = array('I').itemsize
+        pos = frame['dead'] * id_size
+        dead = set(array('I', payload[:pos]))
+        kept = [n for n in range(len(ids)) if n not in dead]
+        kept_values = []
+        for n in kept:
+            kept_values += values[n * stride:(n + 1) * stride]
+        deltas = struct.unpack_from(f"<{frame['kept'] * stride}e", payload, pos)
+        pos += 2 * len(deltas)
+        spawned_ids = array('I', payload[pos:pos + frame['spawned'] * id_size])
+        pos += len(spawned_ids) * id_size
+        return ([ids[n] for n in kept] + list(spawned_ids),
+                [v + d for v, d in zip(kept_values, deltas)] + list(array('f', payload[pos:])))
+
+    def frame(self, index):
+        # returns the ids and the values recorded for them, survivors come first and spawns after them
+        if not 0 <= index < len(self.frames):
+            raise IndexError("rewind frame out of range")
+        start = index
+        while not self.frames[start]['keyframe']:
+            start -= 1
+        state = (None, None)
+        # stepping forward while scrubbing continues from the last decoded frame
+        if self.cache_index is not None and start <= self.cache_index <= index:
+            start = self.cache_index + 1
+            state = self.cache_state
+        for n in range(start, index + 1):
+            state = self.decode(self.frames[n], *state)
+        self.cache_index = index
+        self.cache_state = state
+        return state
+
+    def truncate(self, index):
+        # drops the frames after index, used when the simulation resumes from a scrubbed state
+        if index + 1 >= len(self.frames):
+            return
+        self.last_ids, self.last_values = self.frame(index)
+        while len(self.frames) > index + 1:
+            self.frames.pop()
+        last = self.frames[-1]
+        self.write_pos = last['offset'] + last['size']
+        self.since_keyframe = 0
+        for n in range(index, -1, -1):
+            if self.frames[n]['keyframe']:
+                break
+            self.since_keyframe += 1